@@ -0,0 +1,223 @@
+"""
+Project-wide duplicate code detection for Java sources.
+
+Each file is tokenized (comments, imports and package declarations dropped), k-grams of
+token hashes are Karp-Rabin hashed, and winnowing keeps the minimum hash of every window
+of w k-grams as the file's fingerprints. Any duplicate of at least w + k - 1 tokens is
+guaranteed to share a fingerprint. Shared fingerprints are then verified and extended
+token by token into maximal clone pairs.
+
+Per-file tokens and fingerprints are persisted, so only files whose mtime or size changed
+are re-tokenized on the next run.
+"""
+import json
+import os
+import re
+import zlib
+from collections import deque
+from pathlib import Path
+
+HASH_BASE = 257
+HASH_MOD = (1 << 61) - 1
+
+JAVA_COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+JAVA_TOKEN = re.compile(
+    r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|[A-Za-z_$][\w$]*|\d[\w.]*|\S'
+)
+JAVA_KEYWORDS = frozenset("""
+    abstract assert boolean break byte case catch char class const continue default do double
+    else enum extends final finally float for goto if implements import instanceof int interface
+    long native new package private protected public return short static strictfp super switch
+    synchronized this throw throws transient try void volatile while var record yield true false null
+""".split())
+_STATEMENT_ENDS = {zlib.crc32(b";"), zlib.crc32(b"}"), zlib.crc32(b"{")}
+
+
+def _blank(match) -> str:
+    return re.sub(r'[^\n]', ' ', match.group(0))
+
+
+def tokenize(text: str, normalize: bool = False) -> tuple:
+    """
+    Token values (crc32 of the token text) and their 1-based line numbers.
+    With normalize, identifiers and literals collapse to placeholders so renamed copies match.
+    """
+    text = JAVA_COMMENT.sub(_blank, text)
+    values = []
+    lines = []
+    line = 1
+    position = 0
+    skipping = False
+    for match in JAVA_TOKEN.finditer(text):
+        line += text.count("\n", position, match.start())
+        position = match.start()
+        token = match.group(0)
+
+        if skipping:
+            skipping = token != ";"
+            continue
+        if token in ("import", "package") and (not values or values[-1] in _STATEMENT_ENDS):
+            skipping = True
+            continue
+
+        if normalize:
+            first = token[0]
+            if first in "\"'" or first.isdigit():
+                token = "$lit"
+            elif (first.isalpha() or first in "_$") and token not in JAVA_KEYWORDS:
+                token = "$id"
+        values.append(zlib.crc32(token.encode("utf-8")))
+        lines.append(line)
+    return values, lines
+
+
+def fingerprints(values: list, k: int, w: int) -> list:
+    """Winnowed (hash, token position) pairs for the k-grams of `values`."""
+    if len(values) < k:
+        return []
+
+    top = pow(HASH_BASE, k - 1, HASH_MOD)
+    hashes = []
+    h = 0
+    for i, value in enumerate(values):
+        if i >= k:
+            h = (h - values[i - k] * top) % HASH_MOD
+        h = (h * HASH_BASE + value) % HASH_MOD
+        if i >= k - 1:
+            hashes.append(h)
+
+    # Sliding-window minimum over a monotonic deque; popping on >= keeps the rightmost
+    # minimum, so a run of equal hashes is not re-selected for every window
+    selected = []
+    window = deque()
+    last = -1
+    w = min(w, len(hashes))
+    for i, h in enumerate(hashes):
+        while window and hashes[window[-1]] >= h:
+            window.pop()
+        window.append(i)
+        if window[0] <= i - w:
+            window.popleft()
+        if i >= w - 1 and window[0] != last:
+            last = window[0]
+            selected.append((hashes[last], last))
+    return selected
+
+
+class CloneIndex:
+    """
+    Fingerprint index over a source tree, persisted to `cache_path`.
+
+    Attributes:
+        files: Relative path -> {"stamp", "tokens", "lines", "fingerprints"}
+    """
+
+    def __init__(self, cache_path, k: int, w: int, normalize: bool):
+        self.cache_path = Path(cache_path)
+        self.settings = {"k": k, "w": w, "normalize": normalize}
+        self.files = {}
+        if self.cache_path.exists():
+            try:
+                data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+                if data.get("settings") == self.settings:
+                    self.files = data.get("files", {})
+            except (OSError, ValueError):
+                self.files = {}
+
+    def update(self, root: Path, paths) -> dict:
+        """Re-tokenize new or changed files and forget deleted ones."""
+        current = {}
+        for path in paths:
+            stat = path.stat()
+            current[path.relative_to(root).as_posix()] = (path, [stat.st_mtime_ns, stat.st_size])
+
+        removed = [name for name in self.files if name not in current]
+        for name in removed:
+            del self.files[name]
+
+        reindexed = 0
+        for name, (path, stamp) in current.items():
+            entry = self.files.get(name)
+            if entry and entry["stamp"] == stamp:
+                continue
+            values, lines = tokenize(path.read_text(encoding="utf-8", errors="replace"), self.settings["normalize"])
+            self.files[name] = {
+                "stamp": stamp,
+                "tokens": values,
+                "lines": lines,
+                "fingerprints": fingerprints(values, self.settings["k"], self.settings["w"])
+            }
+            reindexed += 1
+
+        return {"files": len(current), "reindexed": reindexed, "removed": len(removed)}
+
+    def save(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"settings": self.settings, "files": self.files}), encoding="utf-8")
+        os.replace(tmp, self.cache_path)
+
+    def find_clones(self, min_tokens: int, max_occurrences: int = 32) -> list:
+        """
+        Maximal duplicated fragments of at least `min_tokens` tokens, longest first.
+        Fingerprints shared by more than `max_occurrences` places (boilerplate) are ignored.
+        """
+        k = self.settings["k"]
+        postings = {}
+        for name, entry in self.files.items():
+            for h, position in entry["fingerprints"]:
+                postings.setdefault(h, []).append((name, position))
+
+        found = {}
+        clones = []
+        for places in postings.values():
+            if len(places) < 2 or len(places) > max_occurrences:
+                continue
+            for i in range(len(places)):
+                for j in range(i + 1, len(places)):
+                    clone = self._extend(places[i], places[j], k, found)
+                    if clone and clone["tokens"] >= min_tokens:
+                        clones.append(clone)
+
+        clones.sort(key=lambda c: -c["tokens"])
+        return clones
+
+    def _extend(self, a, b, k: int, found: dict):
+        (file_a, pos_a), (file_b, pos_b) = sorted((a, b))
+        if file_a == file_b and pos_a == pos_b:
+            return None
+
+        # Skip places already inside a clone found along the same diagonal
+        diagonal = (file_a, file_b, pos_b - pos_a)
+        for start, stop in found.get(diagonal, ()):
+            if start <= pos_a < stop:
+                return None
+
+        tokens_a = self.files[file_a]["tokens"]
+        tokens_b = self.files[file_b]["tokens"]
+        if tokens_a[pos_a:pos_a + k] != tokens_b[pos_b:pos_b + k]:
+            return None  # hash collision
+
+        start_a, start_b = pos_a, pos_b
+        while start_a > 0 and start_b > 0 and tokens_a[start_a - 1] == tokens_b[start_b - 1]:
+            start_a -= 1
+            start_b -= 1
+        end_a, end_b = pos_a + k, pos_b + k
+        while end_a < len(tokens_a) and end_b < len(tokens_b) and tokens_a[end_a] == tokens_b[end_b]:
+            end_a += 1
+            end_b += 1
+        if file_a == file_b and end_a > start_b:
+            end_a = start_b  # overlapping self-match: keep the non-overlapping part
+            end_b = start_b + (end_a - start_a)
+            if end_a - start_a < k:
+                return None
+
+        found.setdefault(diagonal, []).append((start_a, end_a))
+        lines_a = self.files[file_a]["lines"]
+        lines_b = self.files[file_b]["lines"]
+        return {
+            "tokens": end_a - start_a,
+            "lines": lines_a[end_a - 1] - lines_a[start_a] + 1,
+            "first": {"file": file_a, "start_line": lines_a[start_a], "end_line": lines_a[end_a - 1]},
+            "second": {"file": file_b, "start_line": lines_b[start_b], "end_line": lines_b[end_b - 1]}
+        }
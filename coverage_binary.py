@@ -0,0 +1,350 @@
+"""
+Compact columnar binary export of JaCoCo coverage (.jcov) and a zero-copy loader.
+
+One file holds any number of modules' jacoco.xml reports as flat typed columns:
+
+    header     <4sHHII   magic b"JCOV", version, reserved, section count, reserved
+    directory  <32sc3xIQ per section: name, array typecode, element count, byte offset
+    sections   little-endian arrays, each starting on an 8-byte boundary
+
+Tables and their columns (the *_start columns hold n + 1 offsets into the next table):
+
+    strings  string_offsets, string_data (UTF-8); every name below is a string id
+    modules  module_name, module_class_start, module_source_start,
+             module_<COUNTER>_MISSED / module_<COUNTER>_COVERED (the report totals)
+    classes  class_package, class_name, class_source (-1 if none), class_method_start,
+             class_<COUNTER>_MISSED / class_<COUNTER>_COVERED
+    methods  method_name, method_desc, method_line, method_<COUNTER>_MISSED / _COVERED
+    sources  source_package, source_name, source_line_start
+    lines    line_nr, line_mi, line_ci, line_mb, line_cb
+
+Package, class, source file and method names are interned, so each distinct string is
+stored once. The loader maps the file and exposes every column as a memoryview cast
+straight onto the mapping; nothing is parsed or copied until a value is read.
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from pathlib import Path
+
+from coverage_csv import COUNTERS, _counter_stats
+
+MAGIC = b"JCOV"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+SECTION = struct.Struct("<32sc3xIQ")
+ALIGNMENT = 8
+
+COUNTER_COLUMNS = tuple(f"{counter}_{kind}" for counter in COUNTERS for kind in ("MISSED", "COVERED"))
+LINE_COLUMNS = ("line_nr", "line_mi", "line_ci", "line_mb", "line_cb")
+
+
+class CoverageFormatError(ValueError):
+    pass
+
+
+class _Writer:
+    """Accumulates reports into column arrays."""
+
+    def __init__(self):
+        self.strings = {}
+        self.columns = {}
+
+    def column(self, name: str, typecode: str = "I") -> array:
+        values = self.columns.get(name)
+        if values is None:
+            values = self.columns[name] = array(typecode)
+        return values
+
+    def intern(self, value: str) -> int:
+        string_id = self.strings.get(value)
+        if string_id is None:
+            string_id = self.strings[value] = len(self.strings)
+        return string_id
+
+    def start_tables(self):
+        self.column("module_name")
+        for name in ("module_class_start", "module_source_start", "class_method_start", "source_line_start"):
+            self.column(name).append(0)
+        for name in ("class_package", "class_name", "class_source", "method_name", "method_desc", "method_line",
+                     "source_package", "source_name") + LINE_COLUMNS:
+            self.column(name, "i" if name == "class_source" else "I")
+        for name in COUNTER_COLUMNS:
+            for table in ("module", "class", "method"):
+                self.column(f"{table}_{name}")
+
+    def add_counters(self, prefix: str, elem):
+        counters = {c.get("type"): c for c in elem.findall("counter")}
+        for counter in COUNTERS:
+            c = counters.get(counter)
+            self.columns[f"{prefix}_{counter}_MISSED"].append(int(c.get("missed", 0)) if c is not None else 0)
+            self.columns[f"{prefix}_{counter}_COVERED"].append(int(c.get("covered", 0)) if c is not None else 0)
+
+    def add_report(self, module: str, path):
+        columns = self.columns
+        columns["module_name"].append(self.intern(module))
+        package_id = None
+        # Classes name their source file before the package's <sourcefile> elements appear,
+        # so source ids are assigned on first reference from either side
+        sources = {}
+        pending_lines = {}
+
+        def source_id(package: int, name: str) -> int:
+            key = (package, name)
+            if key not in sources:
+                sources[key] = len(sources)
+            return sources[key]
+
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == "package":
+                    package_id = self.intern(elem.get("name"))
+                continue
+
+            if tag == "class" and package_id is not None:
+                for method in elem.findall("method"):
+                    columns["method_name"].append(self.intern(method.get("name")))
+                    columns["method_desc"].append(self.intern(method.get("desc", "")))
+                    columns["method_line"].append(int(method.get("line", 0)))
+                    self.add_counters("method", method)
+                columns["class_package"].append(package_id)
+                columns["class_name"].append(self.intern(elem.get("name")))
+                source = elem.get("sourcefilename")
+                columns["class_source"].append(source_id(package_id, source) if source else -1)
+                columns["class_method_start"].append(len(columns["method_name"]))
+                self.add_counters("class", elem)
+                elem.clear()
+            elif tag == "sourcefile" and package_id is not None:
+                pending_lines[source_id(package_id, elem.get("name"))] = [
+                    [int(line.get(k, 0)) for k in ("nr", "mi", "ci", "mb", "cb")] for line in elem.findall("line")
+                ]
+                elem.clear()
+            elif tag == "package":
+                package_id = None
+                elem.clear()
+            elif tag == "report":
+                self.add_counters("module", elem)
+
+        # Source ids are module-local; shift them past the sources of earlier modules
+        base = columns["module_source_start"][-1]
+        first_class = columns["module_class_start"][-1]
+        class_source = columns["class_source"]
+        for i in range(first_class, len(class_source)):
+            if class_source[i] >= 0:
+                class_source[i] += base
+        for (package, name), local_id in sorted(sources.items(), key=lambda item: item[1]):
+            columns["source_package"].append(package)
+            columns["source_name"].append(self.intern(name))
+            for values in pending_lines.get(local_id, ()):
+                for column, value in zip(LINE_COLUMNS, values):
+                    columns[column].append(value)
+            columns["source_line_start"].append(len(columns["line_nr"]))
+
+        columns["module_class_start"].append(len(class_source))
+        columns["module_source_start"].append(base + len(sources))
+
+    def string_sections(self) -> dict:
+        offsets = array("I", [0])
+        data = bytearray()
+        for value in self.strings:  # dicts keep insertion order, i.e. id order
+            data += value.encode("utf-8")
+            offsets.append(len(data))
+        return {"string_offsets": offsets, "string_data": array("B", data)}
+
+    def write(self, dest: Path) -> int:
+        sections = {**self.string_sections(), **self.columns}
+        offset = HEADER.size + SECTION.size * len(sections)
+        directory = []
+        for name, values in sections.items():
+            offset += -offset % ALIGNMENT
+            directory.append(SECTION.pack(name.encode("ascii"), values.typecode.encode("ascii"), len(values), offset))
+            offset += len(values) * values.itemsize
+
+        tmp = dest.with_name(dest.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(sections), 0))
+            f.write(b"".join(directory))
+            for values in sections.values():
+                f.write(b"\0" * (-f.tell() % ALIGNMENT))
+                if sys.byteorder == "big" and values.itemsize > 1:
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                values.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, dest)
+        return offset
+
+
+def export(reports, dest) -> dict:
+    """
+    Write jacoco.xml reports to one .jcov file.
+
+    Args:
+        reports: (module name, jacoco.xml path) pairs
+        dest: Output path
+
+    Returns:
+        Dictionary with row counts per table, distinct strings and the file size
+    """
+    dest = Path(dest)
+    writer = _Writer()
+    writer.start_tables()
+    for module, path in reports:
+        writer.add_report(module, path)
+    size = writer.write(dest)
+    columns = writer.columns
+    return {
+        "modules": len(columns["module_name"]),
+        "classes": len(columns["class_name"]),
+        "methods": len(columns["method_name"]),
+        "source_files": len(columns["source_name"]),
+        "lines": len(columns["line_nr"]),
+        "strings": len(writer.strings),
+        "size_bytes": size
+    }
+
+
+class CoverageSnapshot:
+    """
+    Read-only view of a .jcov file.
+
+    Attributes:
+        columns: Section name -> memoryview over the mapped file (a copy on big-endian hosts)
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._class_rows = None
+        self.columns = {}
+        try:
+            self._read_directory()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_directory(self):
+        if len(self._map) < HEADER.size:
+            raise CoverageFormatError(f"{self.path} is not a .jcov file")
+        magic, version, _, count, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise CoverageFormatError(f"{self.path} is not a .jcov file")
+        if version != VERSION:
+            raise CoverageFormatError(f"Unsupported .jcov version {version}")
+
+        for i in range(count):
+            name, typecode, length, offset = SECTION.unpack_from(self._map, HEADER.size + i * SECTION.size)
+            name = name.rstrip(b"\0").decode("ascii")
+            typecode = typecode.decode("ascii")
+            itemsize = array(typecode).itemsize
+            if offset + length * itemsize > len(self._map):
+                raise CoverageFormatError(f"Section {name} extends past the end of {self.path}")
+            raw = self._view[offset:offset + length * itemsize]
+            if sys.byteorder == "big" and itemsize > 1:
+                values = array(typecode, raw.tobytes())
+                values.byteswap()
+                raw.release()
+                self.columns[name] = memoryview(values)
+            else:
+                self.columns[name] = raw.cast(typecode)
+                raw.release()
+
+    def close(self):
+        for view in self.columns.values():
+            view.release()
+        self.columns = {}
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.columns["class_name"])
+
+    def string(self, string_id: int) -> str:
+        offsets = self.columns["string_offsets"]
+        return bytes(self.columns["string_data"][offsets[string_id]:offsets[string_id + 1]]).decode("utf-8")
+
+    # ------------------------------------------------------------ queries
+
+    def modules(self) -> list:
+        names = self.columns["module_name"]
+        starts = self.columns["module_class_start"]
+        return [{"module": self.string(names[i]), "class_start": starts[i], "class_stop": starts[i + 1]}
+                for i in range(len(names))]
+
+    def totals(self, module: str = None) -> dict:
+        """Report-level counter totals summed over every module, or for one module."""
+        names = [self.string(string_id) for string_id in self.columns["module_name"]]
+        if module is None:
+            rows = range(len(names))
+        elif module in names:
+            rows = [names.index(module)]
+        else:
+            raise KeyError(module)
+        return {
+            f"{counter.lower()}_coverage": _counter_stats(
+                sum(self.columns[f"module_{counter}_MISSED"][i] for i in rows),
+                sum(self.columns[f"module_{counter}_COVERED"][i] for i in rows)
+            )
+            for counter in COUNTERS
+        }
+
+    def find_class(self, name: str) -> list:
+        """Row indexes of a class (slash or dot separated); one per module it appears in."""
+        if self._class_rows is None:
+            rows_by_id = {}
+            for row, string_id in enumerate(self.columns["class_name"]):
+                rows_by_id.setdefault(string_id, []).append(row)
+            self._class_rows = {self.string(string_id): rows for string_id, rows in rows_by_id.items()}
+        return list(self._class_rows.get(name.replace(".", "/"), ()))
+
+    def class_row(self, row: int) -> dict:
+        columns = self.columns
+        module = bisect.bisect_right(columns["module_class_start"], row) - 1
+        source = columns["class_source"][row]
+        return {
+            "module": self.string(columns["module_name"][module]),
+            "package": self.string(columns["class_package"][row]),
+            "class": self.string(columns["class_name"][row]),
+            "source_file": self.string(columns["source_name"][source]) if source >= 0 else None,
+            **{f"{counter.lower()}_coverage": _counter_stats(columns[f"class_{counter}_MISSED"][row],
+                                                              columns[f"class_{counter}_COVERED"][row])
+               for counter in COUNTERS}
+        }
+
+    def methods(self, row: int) -> list:
+        columns = self.columns
+        start, stop = columns["class_method_start"][row], columns["class_method_start"][row + 1]
+        return [{
+            "name": self.string(columns["method_name"][i]),
+            "desc": self.string(columns["method_desc"][i]),
+            "line": columns["method_line"][i],
+            **{counter: (columns[f"method_{counter}_MISSED"][i], columns[f"method_{counter}_COVERED"][i])
+               for counter in COUNTERS}
+        } for i in range(start, stop)]
+
+    def lines(self, row: int) -> list:
+        """(nr, mi, ci, mb, cb) for every line of the class's source file."""
+        source = self.columns["class_source"][row]
+        if source < 0:
+            return []
+        start, stop = self.columns["source_line_start"][source], self.columns["source_line_start"][source + 1]
+        return list(zip(*(self.columns[name][start:stop] for name in LINE_COLUMNS)))
+
+
+def load(path) -> CoverageSnapshot:
+    return CoverageSnapshot(path)
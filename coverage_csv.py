@@ -0,0 +1,158 @@
+"""
+Typed, cached aggregation over JaCoCo's jacoco.csv report.
+
+The CSV is parsed once into one typed integer array per counter column; totals, top-N
+missed classes and per-package rollups are then computed in single passes over those
+columns. Parsed tables are cached by path, mtime and size.
+"""
+import heapq
+import os
+import threading
+from array import array
+
+COUNTERS = ("INSTRUCTION", "BRANCH", "LINE", "COMPLEXITY", "METHOD")
+COLUMNS = tuple(f"{counter}_{kind}" for counter in COUNTERS for kind in ("MISSED", "COVERED"))
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _percentage(covered: int, total: int) -> float:
+    return round(covered / total * 100, 2) if total else 0.0
+
+
+def _counter_stats(missed: int, covered: int) -> dict:
+    total = missed + covered
+    return {"missed": missed, "covered": covered, "total": total, "percentage": _percentage(covered, total)}
+
+
+class CoverageTable:
+    """
+    Column-oriented view of jacoco.csv.
+
+    Attributes:
+        package_names: Distinct package names (each stored once)
+        package_index: Per-row index into package_names
+        class_names: Per-row class name
+        columns: Counter column name (e.g. "LINE_MISSED") -> array('q') of per-row values
+    """
+
+    def __init__(self, package_names, package_index, class_names, columns):
+        self.package_names = package_names
+        self.package_index = package_index
+        self.class_names = class_names
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.class_names)
+
+    @classmethod
+    def parse(cls, path: str) -> "CoverageTable":
+        with open(path, encoding="utf-8") as f:
+            header = f.readline().strip().split(",")
+            rows = [line.rstrip("\r\n").split(",") for line in f if line.strip()]
+
+        position = {name: i for i, name in enumerate(header)}
+        missing = [name for name in ("PACKAGE", "CLASS") + COLUMNS if name not in position]
+        if missing:
+            raise ValueError(f"jacoco.csv is missing columns: {', '.join(missing)}")
+
+        # Transpose once, then convert each column in a single typed pass
+        fields = list(zip(*rows)) if rows else [()] * len(header)
+
+        package_ids = {}
+        package_index = array("i", (package_ids.setdefault(name, len(package_ids))
+                                    for name in fields[position["PACKAGE"]]))
+        package_names = [None] * len(package_ids)
+        for name, i in package_ids.items():
+            package_names[i] = name
+
+        columns = {name: array("q", map(int, fields[position[name]])) for name in COLUMNS}
+        return cls(package_names, package_index, list(fields[position["CLASS"]]), columns)
+
+    def totals(self) -> dict:
+        return {
+            f"{counter.lower()}_coverage": _counter_stats(
+                sum(self.columns[f"{counter}_MISSED"]), sum(self.columns[f"{counter}_COVERED"])
+            )
+            for counter in COUNTERS
+        }
+
+    def top_missed(self, n: int = 10, counter: str = "LINE") -> list:
+        """The n classes with the most missed `counter` items (partial sort via heap)."""
+        missed = self.columns[f"{counter}_MISSED"]
+        covered = self.columns[f"{counter}_COVERED"]
+        rows = heapq.nlargest(n, (i for i in range(len(missed)) if missed[i] > 0), key=missed.__getitem__)
+        return [
+            {
+                "class": f"{self.package_names[self.package_index[i]]}.{self.class_names[i]}",
+                "missed": missed[i],
+                "covered": covered[i],
+                "percentage": _percentage(covered[i], missed[i] + covered[i])
+            }
+            for i in rows
+        ]
+
+    def classes_with_missed(self, counter: str = "LINE") -> int:
+        return sum(1 for value in self.columns[f"{counter}_MISSED"] if value > 0)
+
+    def package_rollup(self, counters=("LINE", "BRANCH")) -> dict:
+        """Per-package missed/covered sums for the given counters."""
+        size = len(self.package_names)
+        rollup = {}
+        for counter in counters:
+            missed_sums = [0] * size
+            covered_sums = [0] * size
+            for package, missed, covered in zip(self.package_index,
+                                                self.columns[f"{counter}_MISSED"],
+                                                self.columns[f"{counter}_COVERED"]):
+                missed_sums[package] += missed
+                covered_sums[package] += covered
+            rollup[counter] = (missed_sums, covered_sums)
+
+        return {
+            name: {
+                f"{counter.lower()}_coverage": _counter_stats(rollup[counter][0][i], rollup[counter][1][i])
+                for counter in counters
+            }
+            for i, name in enumerate(self.package_names)
+        }
+
+
+def load(path: str) -> CoverageTable:
+    """Parse `path`, reusing the cached table while its mtime and size are unchanged."""
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+    table = CoverageTable.parse(path)
+    with _cache_lock:
+        _cache[key] = (stamp, table)
+    return table
+
+
+def summary_text(table: CoverageTable) -> str:
+    """coverage-summary.txt contents for the table's line and branch totals."""
+    return summary_from_totals(table.totals())
+
+
+def summary_from_totals(totals: dict, generated_by: str = "scripts/jacoco_csv.py") -> str:
+    """coverage-summary.txt contents for totals shaped like CoverageTable.totals()."""
+    line = totals["line_coverage"]
+    branch = totals["branch_coverage"]
+    return (
+        "JaCoCo coverage snapshot\n\n"
+        f"LINE_COVERED={line['covered']}\n"
+        f"LINE_MISSED={line['missed']}\n"
+        f"LINE_TOTAL={line['total']}\n"
+        f"LINE_PCT={line['percentage']:.2f}\n\n"
+        f"BRANCH_COVERED={branch['covered']}\n"
+        f"BRANCH_MISSED={branch['missed']}\n"
+        f"BRANCH_TOTAL={branch['total']}\n"
+        f"BRANCH_PCT={branch['percentage']:.2f}\n\n"
+        f"Generated by {generated_by}\n"
+    )
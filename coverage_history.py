@@ -0,0 +1,218 @@
+"""
+Append-only, columnar coverage history.
+
+Each recorded run appends one row per class to a set of column files (one typed array
+per counter plus interned package/class ids) and then one line to runs.jsonl holding
+the commit, timestamp, totals and the run's row range. The runs.jsonl line is written
+last, so a run is only visible once all of its rows are on disk; a torn runs.jsonl line
+and rows left behind by an interrupted append are truncated by the next one.
+
+Trend queries read only the id columns and the requested counter's two columns, never
+the original reports.
+"""
+import json
+import os
+import threading
+from array import array
+from pathlib import Path
+
+from coverage_csv import COLUMNS, _counter_stats
+
+RUNS_FILE = "runs.jsonl"
+PACKAGES_FILE = "packages.txt"
+CLASSES_FILE = "classes.txt"
+ID_COLUMNS = ("package_id", "class_id")
+
+_lock = threading.Lock()
+
+
+def _column_path(root: Path, name: str) -> Path:
+    return root / f"{name}.col"
+
+
+def _index(names: list) -> dict:
+    """Name -> id; ids are line numbers, the first occurrence wins."""
+    ids = {}
+    for i, name in enumerate(names):
+        ids.setdefault(name, i)
+    return ids
+
+
+def _read_names(path: Path) -> list:
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f]
+
+
+class CoverageHistory:
+    """
+    Coverage history stored under `root`.
+
+    Attributes:
+        root: Directory holding runs.jsonl, the name dictionaries and the .col files
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    # ------------------------------------------------------------ reading
+
+    def runs(self) -> list:
+        path = self.root / RUNS_FILE
+        if not path.exists():
+            return []
+        runs = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    break  # torn final line from an interrupted append
+        return runs
+
+    def _repair_runs(self) -> list:
+        """
+        Cut runs.jsonl back to its last complete line, so runs appended after an
+        interrupted write stay readable. Returns the surviving runs.
+        """
+        path = self.root / RUNS_FILE
+        if not path.exists():
+            return []
+        data = path.read_bytes()
+        runs = []
+        valid = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                if line.strip():
+                    runs.append(json.loads(line))
+            except ValueError:
+                break
+            valid += len(line)
+        if valid < len(data) or (data and not data.endswith(b"\n")):
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+                if valid and not data[:valid].endswith(b"\n"):
+                    f.seek(valid)
+                    f.write(b"\n")  # complete run whose newline was lost
+                f.flush()
+                os.fsync(f.fileno())
+        return runs
+
+    def _column(self, name: str, start: int, stop: int) -> array:
+        typecode = "i" if name in ID_COLUMNS else "q"
+        values = array(typecode)
+        with open(_column_path(self.root, name), "rb") as f:
+            f.seek(start * values.itemsize)
+            values.fromfile(f, stop - start)
+        return values
+
+    def _window(self, last_n: int) -> list:
+        runs = self.runs()
+        return runs[-last_n:] if last_n else runs
+
+    # ------------------------------------------------------------ writing
+
+    def append(self, table, commit: str, timestamp: str, label: str = None) -> dict:
+        """Append every class row of a coverage_csv.CoverageTable as one run."""
+        with _lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            runs = self._repair_runs()
+            row_start = runs[-1]["row_stop"] if runs else 0
+
+            packages = _read_names(self.root / PACKAGES_FILE)
+            classes = _read_names(self.root / CLASSES_FILE)
+            package_ids = _index(packages)
+            class_ids = _index(classes)
+            new_packages = []
+            new_classes = []
+
+            def intern(name, ids, names, new):
+                if name not in ids:
+                    ids[name] = len(names) + len(new)
+                    new.append(name)
+                return ids[name]
+
+            package_column = array("i")
+            class_column = array("i")
+            for row in range(len(table)):
+                package = table.package_names[table.package_index[row]]
+                package_column.append(intern(package, package_ids, packages, new_packages))
+                class_column.append(intern(f"{package}.{table.class_names[row]}", class_ids, classes, new_classes))
+
+            for path, names in ((PACKAGES_FILE, new_packages), (CLASSES_FILE, new_classes)):
+                if names:
+                    with open(self.root / path, "a", encoding="utf-8") as f:
+                        f.write("".join(f"{name}\n" for name in names))
+
+            columns = {"package_id": package_column, "class_id": class_column}
+            columns.update((name, table.columns[name]) for name in COLUMNS)
+            for name, values in columns.items():
+                path = _column_path(self.root, name)
+                with open(path, "ab") as f:
+                    f.truncate(row_start * values.itemsize)  # drop rows of an interrupted append
+                    values.tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            run = {
+                "run": len(runs),
+                "commit": commit,
+                "timestamp": timestamp,
+                "label": label,
+                "classes": len(table),
+                "row_start": row_start,
+                "row_stop": row_start + len(table),
+                "totals": table.totals()
+            }
+            with open(self.root / RUNS_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(run) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            return run
+
+    # ------------------------------------------------------------ queries
+
+    def total_trend(self, counter: str = "LINE", last_n: int = 10) -> list:
+        key = f"{counter.lower()}_coverage"
+        return [
+            {"run": run["run"], "commit": run["commit"], "timestamp": run["timestamp"], **run["totals"][key]}
+            for run in self._window(last_n)
+        ]
+
+    def trend(self, name: str, scope: str = "class", counter: str = "LINE", last_n: int = 10) -> list:
+        """
+        Per-run missed/covered sums for one class (fully qualified, as recorded) or one package.
+        Runs in which the class/package did not appear are returned with total 0.
+        """
+        names = _read_names(self.root / (CLASSES_FILE if scope == "class" else PACKAGES_FILE))
+        wanted = {i for i, value in enumerate(names) if value == name}
+        window = self._window(last_n)
+        if not window:
+            return []
+
+        start, stop = window[0]["row_start"], window[-1]["row_stop"]
+        ids = self._column("class_id" if scope == "class" else "package_id", start, stop)
+        missed = self._column(f"{counter}_MISSED", start, stop)
+        covered = self._column(f"{counter}_COVERED", start, stop)
+
+        trend = []
+        for run in window:
+            missed_sum = covered_sum = 0
+            for row in range(run["row_start"] - start, run["row_stop"] - start):
+                if ids[row] in wanted:
+                    missed_sum += missed[row]
+                    covered_sum += covered[row]
+            trend.append({"run": run["run"], "commit": run["commit"], "timestamp": run["timestamp"],
+                          **_counter_stats(missed_sum, covered_sum)})
+        return trend
+
+    def run(self, index: int = -1) -> dict:
+        runs = self.runs()
+        try:
+            return runs[index]
+        except IndexError:
+            return None
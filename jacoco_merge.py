@@ -0,0 +1,460 @@
+"""
+Merge JaCoCo execution data (jacoco.exec) and XML reports (jacoco.xml).
+
+Exec files are merged exactly: probe arrays are OR-ed per class id, and a class name
+showing up with different ids (i.e. different bytecode) is reported as a version mismatch.
+
+XML reports carry counters rather than probes, so their union is computed per line
+(covered instructions/branches = max over reports). Method instruction, branch and line
+counters are then re-derived from the merged lines each method spans, and rolled up to
+class, source file, package and report level, so every level agrees. Classes whose
+shape differs between reports (different methods or instruction totals) are reported and
+taken from the first report only. Both merges stream their inputs and scale linearly
+with total input size.
+"""
+import bisect
+import struct
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+# Exec file format (org.jacoco.core.data.ExecutionDataWriter)
+BLOCK_HEADER = 0x01
+BLOCK_SESSIONINFO = 0x10
+BLOCK_EXECUTIONDATA = 0x11
+EXEC_MAGIC = 0xC0C0
+EXEC_VERSION = 0x1007
+
+COUNTER_ORDER = ("INSTRUCTION", "BRANCH", "LINE", "COMPLEXITY", "METHOD", "CLASS")
+
+
+class ExecFormatError(ValueError):
+    pass
+
+
+# ---------------------------------------------------------------- exec files
+
+def _read_exact(f, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ExecFormatError("Unexpected end of exec file")
+    return data
+
+
+def _read_utf(f) -> bytes:
+    length = struct.unpack(">H", _read_exact(f, 2))[0]
+    return _read_exact(f, length)
+
+
+def _read_varint(f) -> int:
+    value = 0
+    shift = 0
+    while True:
+        byte = _read_exact(f, 1)[0]
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+        shift += 7
+
+
+def _read_probes(f) -> bytearray:
+    count = _read_varint(f)
+    packed = _read_exact(f, (count + 7) // 8)
+    return bytearray((packed[i >> 3] >> (i & 7)) & 1 for i in range(count))
+
+
+def iter_exec(path):
+    """Yield ("session", id, start, dump) and ("class", id, name_bytes, probes) records."""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1)
+            if not block:
+                return
+            block_type = block[0]
+            if block_type == BLOCK_HEADER:
+                magic, version = struct.unpack(">HH", _read_exact(f, 4))
+                if magic != EXEC_MAGIC:
+                    raise ExecFormatError(f"{path}: not a JaCoCo exec file")
+                if version != EXEC_VERSION:
+                    raise ExecFormatError(f"{path}: unsupported exec format version {version:#x}")
+            elif block_type == BLOCK_SESSIONINFO:
+                session_id = _read_utf(f)
+                start, dump = struct.unpack(">qq", _read_exact(f, 16))
+                yield ("session", session_id, start, dump)
+            elif block_type == BLOCK_EXECUTIONDATA:
+                class_id = struct.unpack(">q", _read_exact(f, 8))[0]
+                name = _read_utf(f)
+                yield ("class", class_id, name, _read_probes(f))
+            else:
+                raise ExecFormatError(f"{path}: unknown block type {block_type:#x}")
+
+
+def _write_utf(out, value: bytes):
+    out.write(struct.pack(">H", len(value)))
+    out.write(value)
+
+
+def _write_varint(out, value: int):
+    while value > 0x7F:
+        out.write(bytes([(value & 0x7F) | 0x80]))
+        value >>= 7
+    out.write(bytes([value]))
+
+
+def _write_probes(out, probes):
+    _write_varint(out, len(probes))
+    packed = bytearray((len(probes) + 7) // 8)
+    for i, hit in enumerate(probes):
+        if hit:
+            packed[i >> 3] |= 1 << (i & 7)
+    out.write(bytes(packed))
+
+
+def write_exec(dest, sessions, classes):
+    """Write (id, start, dump) sessions and {class_id: (name_bytes, probes)} as one exec file."""
+    with open(dest, "wb") as out:
+        out.write(bytes([BLOCK_HEADER]))
+        out.write(struct.pack(">HH", EXEC_MAGIC, EXEC_VERSION))
+        for session_id, start, dump in sessions:
+            out.write(bytes([BLOCK_SESSIONINFO]))
+            _write_utf(out, session_id)
+            out.write(struct.pack(">qq", start, dump))
+        for class_id, (name, probes) in classes.items():
+            out.write(bytes([BLOCK_EXECUTIONDATA]))
+            out.write(struct.pack(">q", class_id))
+            _write_utf(out, name)
+            _write_probes(out, probes)
+
+
+def split_sessions(path) -> list:
+    """
+    Group the class records of an exec file by the session dump they follow.
+
+    Returns:
+        List of ((id, start, dump), {class_id: (name_bytes, probes)}) in file order
+    """
+    groups = []
+    for record in iter_exec(path):
+        if record[0] == "session":
+            groups.append((record[1:], {}))
+            continue
+        if not groups:
+            raise ExecFormatError(f"{path}: execution data before any session info")
+        _, class_id, name, probes = record
+        groups[-1][1][class_id] = (name, probes)
+    return groups
+
+
+def merge_exec(paths, dest) -> dict:
+    """
+    OR together the probes of every class id across `paths` and write one exec file.
+
+    Returns:
+        Dictionary with class/session counts and version mismatches
+    """
+    sessions = []
+    seen_sessions = set()
+    classes = {}
+    ids_by_name = {}
+    conflicts = []
+
+    for path in paths:
+        for record in iter_exec(path):
+            if record[0] == "session":
+                key = record[1:]
+                if key not in seen_sessions:
+                    seen_sessions.add(key)
+                    sessions.append(key)
+                continue
+
+            _, class_id, name, probes = record
+            existing = classes.get(class_id)
+            if existing is None:
+                classes[class_id] = (name, probes)
+                ids_by_name.setdefault(name, set()).add(class_id)
+            elif len(existing[1]) != len(probes):
+                conflicts.append({"class": name.decode("utf-8", "replace"), "id": f"{class_id & 0xFFFFFFFFFFFFFFFF:016x}",
+                                  "reason": "probe count differs for the same class id", "file": str(path)})
+            else:
+                merged = existing[1]
+                for i, hit in enumerate(probes):
+                    if hit:
+                        merged[i] = 1
+
+    mismatches = [
+        {"class": name.decode("utf-8", "replace"), "ids": sorted(f"{i & 0xFFFFFFFFFFFFFFFF:016x}" for i in ids)}
+        for name, ids in ids_by_name.items() if len(ids) > 1
+    ]
+
+    write_exec(dest, sessions, classes)
+
+    return {
+        "inputs": len(paths),
+        "sessions": len(sessions),
+        "classes": len(classes),
+        "version_mismatches": mismatches,
+        "conflicts": conflicts
+    }
+
+
+# ---------------------------------------------------------------- xml reports
+
+def _counters(elem) -> dict:
+    return {c.get("type"): [int(c.get("missed", 0)), int(c.get("covered", 0))]
+            for c in elem.findall("counter")}
+
+
+def _union(first: dict, second: dict) -> dict:
+    """Counter union for the same code: keep the larger covered count."""
+    merged = {}
+    for kind in first.keys() | second.keys():
+        a = first.get(kind, [0, 0])
+        b = second.get(kind, [0, 0])
+        total = max(sum(a), sum(b))
+        covered = max(a[1], b[1])
+        merged[kind] = [total - covered, covered]
+    return merged
+
+
+def _add(into: dict, counters: dict, kinds=COUNTER_ORDER):
+    for kind in kinds:
+        if kind in counters:
+            slot = into.setdefault(kind, [0, 0])
+            slot[0] += counters[kind][0]
+            slot[1] += counters[kind][1]
+
+
+def _read_class(elem) -> dict:
+    methods = {}
+    for method in elem.findall("method"):
+        methods[(method.get("name"), method.get("desc"))] = {
+            "line": method.get("line"),
+            "counters": _counters(method)
+        }
+    return {
+        "sourcefilename": elem.get("sourcefilename"),
+        "methods": methods
+    }
+
+
+def _same_class_shape(a: dict, b: dict) -> bool:
+    if a["methods"].keys() != b["methods"].keys():
+        return False
+    for key, method in a["methods"].items():
+        if sum(method["counters"].get("INSTRUCTION", [0, 0])) != \
+                sum(b["methods"][key]["counters"].get("INSTRUCTION", [0, 0])):
+            return False
+    return True
+
+
+def merge_xml(paths, dest, report_name: str = None) -> dict:
+    """
+    Union several jacoco.xml reports and write a report total_coverage/missing_coverage can read.
+
+    Returns:
+        Dictionary with input/class counts and classes whose versions differ
+    """
+    packages = {}
+    sessions = []
+    seen_sessions = set()
+    mismatches = []
+    name = report_name
+
+    for path in paths:
+        package = None
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == "package":
+                    package = packages.setdefault(elem.get("name"), {"classes": {}, "sourcefiles": {}})
+                elif tag == "report" and name is None:
+                    name = elem.get("name")
+                continue
+
+            if tag == "sessioninfo":
+                key = (elem.get("id"), elem.get("start"), elem.get("dump"))
+                if key not in seen_sessions:
+                    seen_sessions.add(key)
+                    sessions.append(key)
+            elif tag == "class" and package is not None:
+                incoming = _read_class(elem)
+                existing = package["classes"].get(elem.get("name"))
+                if existing is None:
+                    package["classes"][elem.get("name")] = incoming
+                elif _same_class_shape(existing, incoming):
+                    for key, method in incoming["methods"].items():
+                        target = existing["methods"][key]
+                        target["counters"] = _union(target["counters"], method["counters"])
+                else:
+                    mismatches.append({"class": elem.get("name"), "file": str(path)})
+                elem.clear()
+            elif tag == "sourcefile" and package is not None:
+                lines = {int(line.get("nr")): [int(line.get(k, 0)) for k in ("mi", "ci", "mb", "cb")]
+                         for line in elem.findall("line")}
+                existing = package["sourcefiles"].get(elem.get("name"))
+                if existing is None:
+                    package["sourcefiles"][elem.get("name")] = lines
+                elif existing.keys() == lines.keys() and all(
+                        existing[nr][0] + existing[nr][1] == v[0] + v[1] for nr, v in lines.items()):
+                    for nr, (mi, ci, mb, cb) in lines.items():
+                        slot = existing[nr]
+                        covered = max(slot[1], ci)
+                        branch_covered = max(slot[3], cb)
+                        slot[:] = [slot[0] + slot[1] - covered, covered, slot[2] + slot[3] - branch_covered, branch_covered]
+                else:
+                    mismatches.append({"sourcefile": f"{elem.get('name')}", "file": str(path)})
+                elem.clear()
+            elif tag == "package":
+                package = None
+                elem.clear()
+
+    class_count = _write_xml(dest, name or "Merged", sessions, packages)
+    return {
+        "inputs": len(paths),
+        "packages": len(packages),
+        "classes": class_count,
+        "sessions": len(sessions),
+        "version_mismatches": mismatches
+    }
+
+
+def _counter_xml(counters: dict) -> str:
+    return "".join(
+        f'<counter type="{kind}" missed="{counters[kind][0]}" covered="{counters[kind][1]}"/>'
+        for kind in COUNTER_ORDER if kind in counters and sum(counters[kind]) > 0
+    )
+
+
+def _method_lines(package) -> dict:
+    """
+    Assign every merged source line to a method. Methods open at their first line and
+    take following lines until their own instruction total is used up, so a lambda on a
+    line inside its enclosing method hands the remaining lines back to it. Lines with no
+    open method go to the closest method before them (or the first one).
+
+    Returns:
+        {(class name, (method name, desc)): [line numbers]} for classes with source lines
+    """
+    starts_by_source = {}
+    for class_name, cls in package["classes"].items():
+        for key, method in cls["methods"].items():
+            if method["line"]:
+                size = sum(method["counters"].get("INSTRUCTION", [0, 0]))
+                starts_by_source.setdefault(cls["sourcefilename"], []).append(
+                    [int(method["line"]), (class_name, key), size])
+
+    assigned = {}
+    for source_name, starts in starts_by_source.items():
+        lines = package["sourcefiles"].get(source_name)
+        if not lines:
+            continue
+        starts.sort(key=lambda start: start[0])
+        for _, method, _ in starts:
+            assigned[method] = []
+        bounds = [start[0] for start in starts]
+        open_methods = []
+        next_start = 0
+        for nr in sorted(lines):
+            while next_start < len(starts) and starts[next_start][0] <= nr:
+                open_methods.append(starts[next_start])
+                next_start += 1
+            while open_methods and open_methods[-1][2] <= 0:
+                open_methods.pop()
+            if open_methods:
+                owner = open_methods[-1]
+            else:
+                owner = starts[max(bisect.bisect_right(bounds, nr) - 1, 0)]
+            owner[2] -= lines[nr][0] + lines[nr][1]
+            assigned[owner[1]].append(nr)
+    return assigned
+
+
+def _line_counters(lines: dict, nrs: list) -> dict:
+    counters = {"INSTRUCTION": [0, 0], "BRANCH": [0, 0], "LINE": [0, 0]}
+    for nr in nrs:
+        mi, ci, mb, cb = lines[nr]
+        counters["INSTRUCTION"][0] += mi
+        counters["INSTRUCTION"][1] += ci
+        counters["BRANCH"][0] += mb
+        counters["BRANCH"][1] += cb
+        if ci:
+            counters["LINE"][1] += 1
+        elif mi:
+            counters["LINE"][0] += 1
+    return counters
+
+
+def _write_xml(dest, report_name: str, sessions, packages) -> int:
+    report_totals = {}
+    class_count = 0
+
+    with open(dest, "w", encoding="utf-8") as out:
+        out.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                  '<!DOCTYPE report PUBLIC "-//JACOCO//DTD Report 1.1//EN" "report.dtd">')
+        out.write(f"<report name={quoteattr(report_name)}>")
+        for session_id, start, dump in sessions:
+            out.write(f"<sessioninfo id={quoteattr(session_id)} start={quoteattr(start)} dump={quoteattr(dump)}/>")
+
+        for package_name in sorted(packages):
+            package = packages[package_name]
+            package_totals = {}
+            per_source = {}
+            method_lines = _method_lines(package)
+            out.write(f"<package name={quoteattr(package_name)}>")
+
+            for class_name in sorted(package["classes"]):
+                cls = package["classes"][class_name]
+                class_totals = {}
+                out.write(f"<class name={quoteattr(class_name)}"
+                          + (f" sourcefilename={quoteattr(cls['sourcefilename'])}" if cls["sourcefilename"] else "")
+                          + ">")
+                for (method_name, desc), method in cls["methods"].items():
+                    # Lines say nothing about how branches split across instructions or
+                    # whether a shared line ran in this method, so COMPLEXITY and METHOD
+                    # keep the per-report maximum; the rest comes from the merged lines.
+                    nrs = method_lines.get((class_name, (method_name, desc)))
+                    if nrs is None:
+                        counters = dict(method["counters"])
+                    else:
+                        counters = _line_counters(package["sourcefiles"][cls["sourcefilename"]], nrs)
+                        counters["COMPLEXITY"] = method["counters"].get("COMPLEXITY", [0, 0])
+                    counters["METHOD"] = [0, 1] if method["counters"].get("INSTRUCTION", [0, 0])[1] else [1, 0]
+                    out.write(f"<method name={quoteattr(method_name)} desc={quoteattr(desc or '')}"
+                              + (f" line={quoteattr(method['line'])}" if method["line"] else "")
+                              + f">{_counter_xml(counters)}</method>")
+                    _add(class_totals, counters, ("INSTRUCTION", "BRANCH", "LINE", "COMPLEXITY", "METHOD"))
+                if class_totals.get("METHOD"):
+                    class_totals["CLASS"] = [0, 1] if class_totals["METHOD"][1] else [1, 0]
+                out.write(_counter_xml(class_totals) + "</class>")
+
+                class_count += 1
+                _add(package_totals, class_totals, ("COMPLEXITY", "METHOD", "CLASS"))
+                _add(per_source.setdefault(cls["sourcefilename"], {}), class_totals, ("COMPLEXITY", "METHOD", "CLASS"))
+
+            for source_name in sorted(package["sourcefiles"]):
+                lines = package["sourcefiles"][source_name]
+                source_totals = dict(per_source.get(source_name, {}))
+                out.write(f"<sourcefile name={quoteattr(source_name)}>")
+                line_counter = [0, 0]
+                instruction_counter = [0, 0]
+                branch_counter = [0, 0]
+                for nr in sorted(lines):
+                    mi, ci, mb, cb = lines[nr]
+                    out.write(f'<line nr="{nr}" mi="{mi}" ci="{ci}" mb="{mb}" cb="{cb}"/>')
+                    if ci:
+                        line_counter[1] += 1
+                    elif mi:
+                        line_counter[0] += 1
+                    instruction_counter[0] += mi
+                    instruction_counter[1] += ci
+                    branch_counter[0] += mb
+                    branch_counter[1] += cb
+                source_totals.update(INSTRUCTION=instruction_counter, BRANCH=branch_counter, LINE=line_counter)
+                out.write(_counter_xml(source_totals) + "</sourcefile>")
+                _add(package_totals, source_totals, ("INSTRUCTION", "BRANCH", "LINE"))
+
+            out.write(_counter_xml(package_totals) + "</package>")
+            _add(report_totals, package_totals)
+
+        out.write(_counter_xml(report_totals) + "</report>")
+
+    return class_count
@@ -0,0 +1,83 @@
+"""
+Check MCP server cold start against the documented startup budget.
+
+Spawns `python server.py --startup-timing` in fresh interpreters and reports the
+median process wall time and the in-process import/registration phases.
+
+    python scripts/benchmark_startup.py --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parent.parent
+server_path = repo_root / 'server.py'
+
+# Startup budget (see README): whole process, interpreter start included, and the
+# part server.py itself controls (imports + tool registration).
+PROCESS_BUDGET_SECONDS = 1.5
+MODULE_BUDGET_SECONDS = 1.0
+
+
+def spawn_once() -> dict:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, str(server_path), '--startup-timing'],
+        cwd=repo_root,
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit(1)
+    report = json.loads(result.stderr.strip().splitlines()[-1])
+    report['process_seconds'] = wall
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='number of cold starts (default: 10)')
+    parser.add_argument('--output', help='optional path to write JSON results')
+    args = parser.parse_args()
+
+    reports = [spawn_once() for _ in range(args.runs)]
+    summary = {
+        'runs': args.runs,
+        'process_seconds_median': round(statistics.median(r['process_seconds'] for r in reports), 6),
+        'module_seconds_median': round(statistics.median(r['total_seconds'] for r in reports), 6),
+        'imports_seconds_median': round(statistics.median(r['imports_seconds'] for r in reports), 6),
+        'registration_seconds_median': round(statistics.median(r['registration_seconds'] for r in reports), 6),
+        'tool_count': reports[-1]['tool_count'],
+        'lazy_modules_loaded': reports[-1]['lazy_modules_loaded'],
+        'budget': {'process_seconds': PROCESS_BUDGET_SECONDS, 'module_seconds': MODULE_BUDGET_SECONDS}
+    }
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    problems = []
+    if summary['process_seconds_median'] > PROCESS_BUDGET_SECONDS:
+        problems.append(f"process start {summary['process_seconds_median']:.3f}s > {PROCESS_BUDGET_SECONDS}s")
+    if summary['module_seconds_median'] > MODULE_BUDGET_SECONDS:
+        problems.append(f"module import {summary['module_seconds_median']:.3f}s > {MODULE_BUDGET_SECONDS}s")
+
+    # fastmcp or its dependencies may pull these in on their own, so only report it
+    if summary['lazy_modules_loaded']:
+        print('NOTE: loaded at startup despite lazy import in server.py:', ', '.join(summary['lazy_modules_loaded']))
+    for problem in problems:
+        print('OVER BUDGET:', problem)
+    if problems:
+        raise SystemExit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Benchmark the report parsers and source analyzers exposed by server.py.
+
+Uses the bundled codebase/target artifacts (jacoco.xml, surefire-reports) and the
+commons-lang3 sources, plus synthetic copies scaled up 10x / 100x, and records wall
+time and peak memory for each tool as JSON.
+
+    python scripts/benchmark_tools.py --scales 1,10,100 --output bench_results.json
+    python scripts/benchmark_tools.py --compare bench_results.json --output bench_current.json
+"""
+import argparse
+import copy
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(repo_root))
+
+import server  # noqa: E402
+
+codebase = repo_root / 'codebase'
+jacoco_xml = codebase / 'target' / 'site' / 'jacoco' / 'jacoco.xml'
+surefire_dir = codebase / 'target' / 'surefire-reports'
+source_file = Path('src/main/java/org/apache/commons/lang3/StringUtils.java')
+
+COUNTER_TYPES = ('INSTRUCTION', 'BRANCH', 'LINE', 'COMPLEXITY', 'METHOD', 'CLASS')
+
+SYNTHETIC_TRACE = (
+    'java.lang.AssertionError: expected:<1> but was:<2>\n'
+    '\tat org.junit.Assert.fail(Assert.java:88)\n'
+    '\tat org.junit.Assert.failNotEquals(Assert.java:743)\n'
+    '\tat {cls}.{test}(Synthetic.java:{line})\n'
+)
+
+
+def scale_jacoco(source: Path, dest: Path, factor: int):
+    """Write a jacoco.xml with every package duplicated `factor` times."""
+    tree = ET.parse(source)
+    root = tree.getroot()
+    packages = root.findall('package')
+    for copy_index in range(1, factor):
+        for package in packages:
+            clone = copy.deepcopy(package)
+            suffix = f'/scaled{copy_index}'
+            clone.set('name', package.get('name') + suffix)
+            for class_elem in clone.iter('class'):
+                class_elem.set('name', class_elem.get('name').replace(package.get('name'), clone.get('name'), 1))
+            root.append(clone)
+    # Keep report-level counters after the packages, scaled to match
+    for counter in root.findall('counter'):
+        root.remove(counter)
+        counter.set('missed', str(int(counter.get('missed')) * factor))
+        counter.set('covered', str(int(counter.get('covered')) * factor))
+        root.append(counter)
+    tree.write(dest, encoding='UTF-8', xml_declaration=True)
+
+
+def scale_surefire(source_dir: Path, dest_dir: Path, factor: int):
+    """Copy surefire reports `factor` times, turning every 10th testcase into a failure."""
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    for report in source_dir.glob('TEST-*.xml'):
+        tree = ET.parse(report)
+        for copy_index in range(factor):
+            root = copy.deepcopy(tree.getroot())
+            for i, testcase in enumerate(root.iter('testcase')):
+                if (i + copy_index) % 10 == 0 and testcase.find('failure') is None:
+                    failure = ET.SubElement(testcase, 'failure')
+                    failure.set('type', 'java.lang.AssertionError')
+                    failure.set('message', 'expected:<1> but was:<2>')
+                    failure.text = SYNTHETIC_TRACE.format(
+                        cls=testcase.get('classname'), test=testcase.get('name'), line=10 + i
+                    )
+            name = report.stem + (f'_{copy_index}' if copy_index else '') + '.xml'
+            ET.ElementTree(root).write(dest_dir / name, encoding='UTF-8', xml_declaration=True)
+
+
+def scale_source(source: Path, dest: Path, factor: int):
+    """Write a Java file whose class body is the original body repeated `factor` times."""
+    content = source.read_text(encoding='utf-8')
+    head, _, body = content.partition('public class StringUtils {')
+    body = body.rstrip().rstrip('}')
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.write_text(head + 'public class StringUtils {' + body * factor + '\n}\n', encoding='utf-8')
+
+
+def measure(fn, repeat: int) -> dict:
+    """Median wall time over `repeat` runs, then one traced run for peak memory."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    failed = isinstance(result, dict) and ('error' in result or result.get('success') is False)
+    return {
+        'wall_seconds_median': round(statistics.median(timings), 6),
+        'wall_seconds_min': round(min(timings), 6),
+        'peak_memory_bytes': peak,
+        'ok': not failed,
+    }
+
+
+def build_project(workdir: Path, factor: int) -> Path:
+    """Lay out a throwaway Maven-style project with artifacts scaled by `factor`."""
+    project = workdir / f'scale{factor}'
+    report_dir = project / 'target' / 'site' / 'jacoco'
+    report_dir.mkdir(parents=True)
+    if factor == 1:
+        shutil.copy(jacoco_xml, report_dir / 'jacoco.xml')
+    else:
+        scale_jacoco(jacoco_xml, report_dir / 'jacoco.xml', factor)
+    scale_surefire(surefire_dir, project / 'target' / 'surefire-reports', factor)
+    scale_source(codebase / source_file, project / source_file, factor)
+    return project
+
+
+def run_benchmarks(scales, repeat: int) -> dict:
+    results = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'runs': []
+    }
+    original_project_path = server.MAVEN_PROJECT_PATH
+
+    with tempfile.TemporaryDirectory(prefix='tool-bench-') as tmp:
+        for factor in scales:
+            project = build_project(Path(tmp), factor)
+            report = project / 'target' / 'site' / 'jacoco' / 'jacoco.xml'
+            server.MAVEN_PROJECT_PATH = str(project)
+            try:
+                cases = {
+                    'total_coverage': lambda: server.total_coverage(str(report)),
+                    'missing_coverage': lambda: server.missing_coverage(str(report)),
+                    'analyze_test_failures': server.analyze_test_failures,
+                    'detect_code_smells': lambda: server.detect_code_smells(str(project / source_file)),
+                    'analyze_java_class': lambda: server.analyze_java_class(str(source_file)),
+                }
+                for name, fn in cases.items():
+                    entry = {'tool': name, 'scale': factor}
+                    entry.update(measure(fn, repeat))
+                    results['runs'].append(entry)
+                    print(f"{name:<24} x{factor:<4} {entry['wall_seconds_median']:>10.4f}s "
+                          f"{entry['peak_memory_bytes'] / 1_048_576:>9.1f} MiB")
+            finally:
+                server.MAVEN_PROJECT_PATH = original_project_path
+
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Return (tool, scale, baseline, current) for runs slower than baseline by `threshold`."""
+    previous = {(r['tool'], r['scale']): r for r in baseline.get('runs', [])}
+    regressions = []
+    for run in current['runs']:
+        before = previous.get((run['tool'], run['scale']))
+        if before and run['wall_seconds_median'] > before['wall_seconds_median'] * (1 + threshold):
+            regressions.append((run['tool'], run['scale'], before['wall_seconds_median'], run['wall_seconds_median']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1,10,100', help='comma separated scale factors (default: 1,10,100)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case (default: 3)')
+    parser.add_argument('--output', default='bench_results.json', help='where to write JSON results')
+    parser.add_argument('--compare', help='previous results JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown vs --compare (default: 0.2)')
+    args = parser.parse_args()
+
+    if not jacoco_xml.exists() or not surefire_dir.exists():
+        print('bundled reports not found under', codebase / 'target')
+        raise SystemExit(1)
+
+    baseline = None
+    if args.compare:
+        if Path(args.compare).resolve() == Path(args.output).resolve():
+            parser.error('--output would overwrite the --compare baseline; pass a different --output')
+        # Read before benchmarking so a bad baseline fails fast
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    scales = [int(s) for s in args.scales.split(',') if s.strip()]
+    results = run_benchmarks(scales, args.repeat)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print('Results written to', args.output)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for tool_name, factor, before, after in regressions:
+            print(f'REGRESSION {tool_name} x{factor}: {before:.4f}s -> {after:.4f}s')
+        if regressions:
+            raise SystemExit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Coverage figures from codebase/target/site/jacoco/jacoco.csv.
+
+    python scripts/jacoco_csv.py totals                 # line / branch / method totals
+    python scripts/jacoco_csv.py top -n 10 --counter LINE
+    python scripts/jacoco_csv.py packages
+    python scripts/jacoco_csv.py summary --write coverage-summary.txt
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(repo_root))
+
+import coverage_csv  # noqa: E402
+
+default_csv = repo_root / 'codebase' / 'target' / 'site' / 'jacoco' / 'jacoco.csv'
+
+
+def print_totals(table):
+    totals = table.totals()
+    for counter in ('line', 'branch', 'method', 'instruction', 'complexity'):
+        stats = totals[f'{counter}_coverage']
+        print(f"{counter.capitalize() + ' coverage:':<22}{stats['percentage']:6.2f}% "
+              f"({stats['covered']} covered, {stats['missed']} missed, {stats['total']} total)")
+
+
+def print_top(table, n, counter):
+    print(f'Top {n} classes by missed {counter.lower()}s '
+          f'({table.classes_with_missed(counter)} classes have missed {counter.lower()}s):')
+    for row in table.top_missed(n, counter):
+        print(f"- {row['class']}: {counter}_MISSED={row['missed']} {counter}_COVERED={row['covered']}")
+
+
+def print_packages(table):
+    rollup = table.package_rollup()
+    for name in sorted(rollup, key=lambda p: rollup[p]['line_coverage']['percentage']):
+        line = rollup[name]['line_coverage']
+        branch = rollup[name]['branch_coverage']
+        print(f"{name:<45} line {line['percentage']:6.2f}% ({line['missed']} missed)  "
+              f"branch {branch['percentage']:6.2f}% ({branch['missed']} missed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', default=str(default_csv), help='path to jacoco.csv')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('totals', help='overall counters')
+    top = sub.add_parser('top', help='classes with the most missed items')
+    top.add_argument('-n', type=int, default=10)
+    top.add_argument('--counter', default='LINE', choices=coverage_csv.COUNTERS)
+    sub.add_parser('packages', help='per-package line and branch coverage')
+    summary = sub.add_parser('summary', help='coverage-summary.txt contents')
+    summary.add_argument('--write', help='write to this file instead of stdout')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print('jacoco.csv not found at', args.csv)
+        raise SystemExit(1)
+
+    table = coverage_csv.load(args.csv)
+
+    if args.command == 'totals':
+        print_totals(table)
+    elif args.command == 'top':
+        print_top(table, args.n, args.counter)
+    elif args.command == 'packages':
+        print_packages(table)
+    elif args.command == 'summary':
+        text = coverage_csv.summary_text(table)
+        if args.write:
+            with open(args.write, 'w', encoding='utf-8') as f:
+                f.write(text)
+            print('Wrote', args.write)
+        else:
+            print(text, end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,483 @@
+"""
+Distributed test shards: a coordinator that hands test-class shards to worker processes
+over TCP, and the worker that runs them with Maven Surefire.
+
+Every message is a 4-byte big-endian header length, a JSON header, then
+header["payload_size"] bytes of payload (a tar archive when files are transferred):
+
+    worker -> coordinator   {"type": "challenge", "nonce"}                (on connect)
+    coordinator -> worker   {"type": "auth", "mac"}   HMAC-SHA256 of the nonce with the shared token
+    coordinator -> worker   {"type": "run", "shard", "bundle", "test_classes", "coverage",
+                             "offline", "timeout"}
+    worker -> coordinator   {"type": "need_bundle", "bundle"}           (bundle not cached yet)
+    coordinator -> worker   {"type": "bundle", "bundle"} + tar of pom.xml, target/classes,
+                            target/test-classes
+    worker -> coordinator   {"type": "result", "shard", "return_code", "output"}
+                            + tar of surefire-reports/ and jacoco.exec
+    coordinator -> worker   {"type": "shutdown"}
+
+Bundles are content-addressed by the sha256 of their file manifest, so each worker
+receives a given build once and reuses it for all later shards. A shard whose worker
+dies or stops answering is put back on the queue for the remaining workers.
+
+Workers only talk to coordinators that know the shared token, and they never run a
+command sent over the wire: they build their own `mvn surefire:test` invocation from
+the validated test class list, using their own JaCoCo agent and Maven settings.
+A bundle is still compiled code that the tests execute, so only share the token with
+coordinators you trust.
+
+Run a worker by hand (e.g. on another machine sharing the Maven repository layout), with
+the token in TESTING_AGENT_SHARD_TOKEN or a file:
+
+    python shard_runner.py worker --port 7070 --work-dir /tmp/shard-worker --token-file ~/.shard-token
+
+Workers listen on 127.0.0.1 by default; reach a remote one through an SSH tunnel
+(ssh -L 7070:127.0.0.1:7070 host) rather than binding it to a public interface.
+"""
+import argparse
+import hashlib
+import hmac
+import io
+import json
+import os
+import re
+import secrets
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tarfile
+import threading
+from collections import deque
+from pathlib import Path
+
+HEADER_LENGTH = struct.Struct(">I")
+BUNDLE_PATHS = ("pom.xml", "target/classes", "target/test-classes")
+CONNECT_TIMEOUT = 10
+OUTPUT_TAIL = 4000
+DEFAULT_SHARD_TIMEOUT = 600
+TOKEN_ENV = "TESTING_AGENT_SHARD_TOKEN"
+TEST_CLASS_NAME = re.compile(r'^[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*$')
+
+
+class AuthenticationError(ConnectionError):
+    pass
+
+
+# ---------------------------------------------------------------- wire format
+
+def send_message(sock, header: dict, payload: bytes = b""):
+    header = dict(header, payload_size=len(payload))
+    encoded = json.dumps(header).encode("utf-8")
+    sock.sendall(HEADER_LENGTH.pack(len(encoded)) + encoded)
+    if payload:
+        sock.sendall(payload)
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock) -> tuple:
+    (length,) = HEADER_LENGTH.unpack(_recv_exact(sock, HEADER_LENGTH.size))
+    header = json.loads(_recv_exact(sock, length).decode("utf-8"))
+    payload = _recv_exact(sock, header.get("payload_size", 0))
+    return header, payload
+
+
+def _tar_bytes(root: Path, names) -> bytes:
+    """Deterministic tar of `names` (files or directories) relative to root."""
+    def normalize(info):
+        info.mtime = 0
+        info.uid = info.gid = 0
+        info.uname = info.gname = ""
+        return info
+
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name in names:
+            path = root / name
+            if path.exists():
+                tar.add(path, arcname=name, filter=normalize)
+    return buffer.getvalue()
+
+
+def _extract(payload: bytes, dest: Path):
+    dest.mkdir(parents=True, exist_ok=True)
+    with tarfile.open(fileobj=io.BytesIO(payload), mode="r") as tar:
+        root = dest.resolve()
+        for member in tar.getmembers():
+            if not (dest / member.name).resolve().is_relative_to(root):
+                raise ValueError(f"unsafe path in archive: {member.name}")
+        tar.extractall(dest, filter="data")
+
+
+def _mac(token: str, nonce: str) -> str:
+    return hmac.new(token.encode("utf-8"), nonce.encode("ascii"), hashlib.sha256).hexdigest()
+
+
+# ---------------------------------------------------------------- bundles
+
+def build_bundle(project_path, cache_dir) -> tuple:
+    """
+    Content-addressed tar of the compiled project.
+
+    Returns:
+        (digest, path to the cached tar)
+    """
+    project = Path(project_path)
+    manifest = hashlib.sha256()
+    for name in BUNDLE_PATHS:
+        path = project / name
+        files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+        for file in files:
+            manifest.update(file.relative_to(project).as_posix().encode("utf-8") + b"\0")
+            manifest.update(hashlib.sha256(file.read_bytes()).digest())
+    digest = manifest.hexdigest()
+
+    bundle = Path(cache_dir) / "bundles" / f"{digest}.tar"
+    if not bundle.exists():
+        bundle.parent.mkdir(parents=True, exist_ok=True)
+        tmp = bundle.with_suffix(".tmp")
+        tmp.write_bytes(_tar_bytes(project, BUNDLE_PATHS))
+        os.replace(tmp, bundle)
+    return digest, bundle
+
+
+# ---------------------------------------------------------------- coordinator
+
+class Coordinator:
+    """
+    Dispatch shards to workers, one connection (and thread) per worker.
+
+    Attributes:
+        workers: (host, port) addresses
+        output_dir: Each shard's results are extracted to output_dir/shard-<id>
+    """
+
+    def __init__(self, workers, bundle_digest: str, bundle_path, output_dir, token: str,
+                 coverage: bool = False, offline: bool = False, timeout: int = DEFAULT_SHARD_TIMEOUT,
+                 max_retries: int = 2):
+        self.workers = list(workers)
+        self.bundle_digest = bundle_digest
+        self.bundle_path = Path(bundle_path)
+        self.output_dir = Path(output_dir)
+        self.token = token
+        self.coverage = coverage
+        self.offline = offline
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._in_flight = 0
+        self.results = {}
+        self.failed = {}
+        self.dead_workers = []
+        self.retries = 0
+
+    def run(self, shards: list) -> dict:
+        self._queue.extend((shard_id, classes, 0) for shard_id, classes in enumerate(shards))
+        threads = [threading.Thread(target=self._serve, args=(address,), daemon=True) for address in self.workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Every worker died before the queue drained
+        for shard_id, classes, attempts in self._queue:
+            self.failed[shard_id] = {"test_classes": classes, "attempts": attempts, "error": "no live workers left"}
+        self._queue.clear()
+        return self.results
+
+    def _next_shard(self):
+        with self._condition:
+            while not self._queue and self._in_flight:
+                self._condition.wait()  # a shard may come back from a dying worker
+            if not self._queue:
+                return None
+            self._in_flight += 1
+            return self._queue.popleft()
+
+    def _finish(self, shard, error: str = None):
+        shard_id, classes, attempts = shard
+        with self._condition:
+            self._in_flight -= 1
+            if error is not None:
+                if attempts < self.max_retries:
+                    self._queue.append((shard_id, classes, attempts + 1))
+                    self.retries += 1
+                else:
+                    self.failed[shard_id] = {"test_classes": classes, "attempts": attempts + 1, "error": error}
+            self._condition.notify_all()
+
+    def _serve(self, address):
+        try:
+            sock = socket.create_connection(address, timeout=CONNECT_TIMEOUT)
+        except OSError as e:
+            with self._condition:
+                self.dead_workers.append({"worker": f"{address[0]}:{address[1]}", "error": str(e)})
+            return
+
+        with sock:
+            sock.settimeout(self.timeout + 60)
+            try:
+                challenge, _ = recv_message(sock)
+                if challenge.get("type") != "challenge":
+                    raise ValueError("worker did not send an authentication challenge")
+                send_message(sock, {"type": "auth", "mac": _mac(self.token, challenge["nonce"])})
+            except (OSError, ConnectionError, ValueError, KeyError) as e:
+                with self._condition:
+                    self.dead_workers.append({"worker": f"{address[0]}:{address[1]}", "error": str(e)})
+                return
+
+            while True:
+                shard = self._next_shard()
+                if shard is None:
+                    try:
+                        send_message(sock, {"type": "shutdown"})
+                    except OSError:
+                        pass
+                    return
+                try:
+                    self._run_shard(sock, shard)
+                    self._finish(shard)
+                except (OSError, ConnectionError, ValueError) as e:
+                    with self._condition:
+                        self.dead_workers.append({"worker": f"{address[0]}:{address[1]}", "error": str(e),
+                                                  "lost_shard": shard[0]})
+                    self._finish(shard, error=str(e))
+                    return
+
+    def _run_shard(self, sock, shard):
+        shard_id, classes, _ = shard
+        send_message(sock, {
+            "type": "run",
+            "shard": shard_id,
+            "bundle": self.bundle_digest,
+            "test_classes": classes,
+            "coverage": self.coverage,
+            "offline": self.offline,
+            "timeout": self.timeout
+        })
+        header, payload = recv_message(sock)
+        if header.get("type") == "denied":
+            raise AuthenticationError("worker rejected the shard token")
+        if header.get("type") == "need_bundle":
+            send_message(sock, {"type": "bundle", "bundle": self.bundle_digest}, self.bundle_path.read_bytes())
+            header, payload = recv_message(sock)
+        if header.get("type") != "result":
+            raise ValueError(f"unexpected message from worker: {header.get('type')}")
+
+        dest = self.output_dir / f"shard-{shard_id}"
+        if dest.exists():
+            shutil.rmtree(dest)
+        _extract(payload, dest)
+        self.results[shard_id] = {
+            "test_classes": classes,
+            "return_code": header.get("return_code"),
+            "output": header.get("output", ""),
+            "coverage": header.get("coverage", False),
+            "dir": str(dest)
+        }
+
+
+# ---------------------------------------------------------------- worker
+
+def _shard_command(header: dict, exec_file: Path, settings: dict) -> list:
+    """The worker's own Maven invocation; only validated fields of `header` are used."""
+    classes = header.get("test_classes")
+    if not isinstance(classes, list) or not classes or not all(
+            isinstance(name, str) and TEST_CLASS_NAME.match(name) for name in classes):
+        raise ValueError("invalid test class list")
+
+    command = ["mvn", "-B", "-nsu"]
+    if header.get("offline") is True:
+        command.append("-o")
+    if settings.get("repo_local"):
+        command.append(f"-Dmaven.repo.local={settings['repo_local']}")
+    command += [
+        "surefire:test",
+        "-Dtest=" + ",".join(classes),
+        "-DfailIfNoTests=false",
+        "-Dmaven.test.failure.ignore=true"
+    ]
+    agent = settings.get("jacoco_agent")
+    if header.get("coverage") is True and agent:
+        command.append(f"-DargLine=-javaagent:{agent}=destfile={exec_file}")
+    else:
+        command.append("-DargLine=")
+    return command
+
+
+def _run_shard(work_dir: Path, header: dict, settings: dict) -> tuple:
+    project = work_dir / "bundles" / header["bundle"]
+    reports = project / "target/surefire-reports"
+    exec_file = project / "target/shard.exec"
+    if reports.exists():
+        shutil.rmtree(reports)
+    if exec_file.exists():
+        exec_file.unlink()
+
+    timeout = header.get("timeout")
+    timeout = timeout if isinstance(timeout, int) and timeout > 0 else DEFAULT_SHARD_TIMEOUT
+    try:
+        command = _shard_command(header, exec_file, settings)
+        result = subprocess.run(command, cwd=project, capture_output=True, text=True, timeout=timeout)
+        return_code, output = result.returncode, result.stdout + result.stderr
+    except ValueError as e:
+        return_code, output = -1, f"shard rejected: {e}"
+    except subprocess.TimeoutExpired:
+        return_code, output = -1, "shard timed out"
+
+    coverage = exec_file.exists()
+    if coverage:
+        exec_file.rename(project / "target/jacoco.exec")
+    payload = _tar_bytes(project / "target", ["surefire-reports", "jacoco.exec"])
+    (project / "target/jacoco.exec").unlink(missing_ok=True)
+    return {"type": "result", "shard": header.get("shard"), "return_code": return_code,
+            "output": output[-OUTPUT_TAIL:], "coverage": coverage}, payload
+
+
+def _authenticate(conn, token: str) -> bool:
+    nonce = secrets.token_hex(16)
+    send_message(conn, {"type": "challenge", "nonce": nonce})
+    header, _ = recv_message(conn)
+    if header.get("type") == "auth" and hmac.compare_digest(str(header.get("mac", "")), _mac(token, nonce)):
+        return True
+    send_message(conn, {"type": "denied"})
+    return False
+
+
+def _handle(conn, work_dir: Path, settings: dict):
+    # A client that never answers the challenge must not hold the worker
+    conn.settimeout(CONNECT_TIMEOUT)
+    if not _authenticate(conn, settings["token"]):
+        raise AuthenticationError("coordinator failed authentication")
+    conn.settimeout(None)
+
+    while True:
+        header, payload = recv_message(conn)
+        kind = header.get("type")
+        if kind == "shutdown":
+            return True
+        if kind != "run":
+            continue
+
+        bundle_digest = str(header.get("bundle", ""))
+        if not re.fullmatch(r"[0-9a-f]{64}", bundle_digest):
+            raise ValueError("invalid bundle digest")
+        project = work_dir / "bundles" / bundle_digest
+        if not project.exists():
+            send_message(conn, {"type": "need_bundle", "bundle": bundle_digest})
+            bundle_header, bundle = recv_message(conn)
+            if bundle_header.get("bundle") != bundle_digest:
+                raise ValueError("worker received the wrong bundle")
+            staging = project.with_name(project.name + ".partial")
+            if staging.exists():
+                shutil.rmtree(staging)
+            _extract(bundle, staging)
+            os.replace(staging, project)
+
+        result, reports = _run_shard(work_dir, header, settings)
+        send_message(conn, result, reports)
+
+
+def serve(host: str, port: int, work_dir, token: str, jacoco_agent: str = None, repo_local: str = None,
+          once: bool = False):
+    """
+    Accept coordinator connections and run their shards one at a time.
+
+    Args:
+        token: Shared secret coordinators must prove they know
+        jacoco_agent: Local JaCoCo agent jar attached when a shard asks for coverage
+        repo_local: Local Maven repository passed to mvn
+    """
+    if not token:
+        raise ValueError(f"a shard token is required (set {TOKEN_ENV} or use --token-file)")
+    settings = {"token": token, "jacoco_agent": jacoco_agent, "repo_local": repo_local}
+    work_dir = Path(work_dir).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    with socket.create_server((host, port)) as server:
+        print(f"LISTENING {host} {server.getsockname()[1]}", flush=True)
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    shutdown = _handle(conn, work_dir, settings)
+                except (OSError, ConnectionError, ValueError) as e:
+                    print(f"connection dropped: {e}", file=sys.stderr, flush=True)
+                    shutdown = False
+            if shutdown and once:
+                return
+
+
+def start_local_workers(count: int, base_dir, token: str, jacoco_agent: str = None,
+                        repo_local: str = None, wrap_command=None, preexec_fn=None) -> list:
+    """
+    Spawn `count` workers on localhost that exit after their coordinator shuts them down.
+    The token is handed over in the environment, not on the command line.
+
+    Args:
+        wrap_command: Optional callable returning the worker command to run instead, e.g.
+                      inside a resource-limited scope
+        preexec_fn: Passed to Popen; limits set there also apply to the worker's mvn runs
+
+    Returns:
+        List of (process, (host, port))
+    """
+    command = [sys.executable, str(Path(__file__).resolve()), "worker", "--host", "127.0.0.1", "--port", "0", "--once"]
+    if jacoco_agent:
+        command += ["--jacoco-agent", str(jacoco_agent)]
+    if repo_local:
+        command += ["--maven-repo-local", str(repo_local)]
+
+    workers = []
+    for i in range(count):
+        worker_command = command + ["--work-dir", str(Path(base_dir) / f"worker-{i}")]
+        process = subprocess.Popen(
+            wrap_command(worker_command) if wrap_command else worker_command,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=dict(os.environ, **{TOKEN_ENV: token}),
+            preexec_fn=preexec_fn
+        )
+        line = process.stdout.readline().split()
+        if len(line) != 3 or line[0] != "LISTENING":
+            process.kill()
+            raise RuntimeError("local shard worker failed to start")
+        workers.append((process, (line[1], int(line[2]))))
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="run a shard worker")
+    worker.add_argument("--host", default="127.0.0.1", help="interface to bind (default: loopback only)")
+    worker.add_argument("--port", type=int, default=0, help="0 picks a free port (printed on startup)")
+    worker.add_argument("--work-dir", required=True, help="where bundles are unpacked and shards run")
+    worker.add_argument("--token-file", help=f"file holding the shared token (default: ${TOKEN_ENV})")
+    worker.add_argument("--jacoco-agent", help="JaCoCo runtime agent jar used when a shard asks for coverage")
+    worker.add_argument("--maven-repo-local", help="local Maven repository for mvn")
+    worker.add_argument("--once", action="store_true", help="exit after the first coordinator shuts down")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        token = Path(args.token_file).expanduser().read_text().strip() if args.token_file else os.environ.get(TOKEN_ENV)
+        if not token:
+            parser.error(f"a shard token is required: set {TOKEN_ENV} or pass --token-file")
+        serve(args.host, args.port, args.work_dir, token, jacoco_agent=args.jacoco_agent,
+              repo_local=args.maven_repo_local, once=args.once)
+
+
+if __name__ == "__main__":
+    main()